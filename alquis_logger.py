@@ -2,6 +2,7 @@ import os
 import json
 import time
 import requests
+from firestore_decode import loads_wishlist_items
 
 # --- Configuration ---
 # This script is hardcoded to only track 'alquis' and specific wishlist items.
@@ -13,43 +14,33 @@ WISHLIST_API_URL = "https://firestore.googleapis.com/v1/projects/sent-wc254r/dat
 # --- Core Functions ---
 
 def get_all_wishlist_data():
-    """Fetches the entire public wishlist collection via a direct API call."""
+    """Fetches the entire public wishlist collection via a direct API call, decoded into WishlistItems."""
     print("Fetching all wishlist data from public API...")
     try:
         response = requests.get(WISHLIST_API_URL, timeout=15)
         response.raise_for_status()
-        return response.json()
+        return loads_wishlist_items(response.content)
     except requests.exceptions.RequestException as e:
         print(f"ERROR: Could not fetch wishlist API: {e}")
         return None
+    except ValueError as e:
+        print(f"ERROR: Could not decode wishlist API response: {e}")
+        return None
 
-def extract_alquis_wishlist(api_data):
+def extract_alquis_wishlist(wishlist_items):
     """
-    Parses the full API response and extracts only the specified wishlist items
-    for the user 'alquis'.
+    Extracts only the specified wishlist items for the user 'alquis'
+    from the decoded wishlist items.
     """
     # Initialize all tracked items with a default value of 0.0.
     # This ensures that if an item is removed from the website, it's reflected
     # in our state file as 0.0, which counts as a change.
     alquis_wishlist = {item: 0.0 for item in WISHLIST_ITEMS_TO_TRACK}
 
-    documents = api_data.get("documents", [])
-    for doc in documents:
-        fields = doc.get("fields", {})
-        owner_uid = fields.get("owner", {}).get("stringValue")
-
-        # Check if this document belongs to alquis
-        if owner_uid == ALQUIS_UID:
-            title = fields.get("title", {}).get("stringValue")
-
-            # Check if this is one of the items we want to track
-            if title in WISHLIST_ITEMS_TO_TRACK:
-                funded_obj = fields.get("funded", {})
-                # Get either the decimal ('doubleValue') or whole number ('integerValue')
-                funded = funded_obj.get("doubleValue") or funded_obj.get("integerValue")
-
-                if funded is not None:
-                    alquis_wishlist[title] = float(funded)
+    for item in wishlist_items:
+        # Only keep the tracked items that belong to alquis
+        if item.owner == ALQUIS_UID and item.title in WISHLIST_ITEMS_TO_TRACK:
+            alquis_wishlist[item.title] = item.funded
 
     return alquis_wishlist
 
@@ -76,13 +67,13 @@ if __name__ == "__main__":
     print(f"Tracking items: {', '.join(WISHLIST_ITEMS_TO_TRACK)}")
 
     # 1. Fetch the latest data from the API
-    full_api_data = get_all_wishlist_data()
-    if not full_api_data:
+    wishlist_items = get_all_wishlist_data()
+    if wishlist_items is None:
         print("Aborting run due to API fetch failure.")
         exit()
 
     # 2. Extract only the specific data we care about
-    current_wishlist = extract_alquis_wishlist(full_api_data)
+    current_wishlist = extract_alquis_wishlist(wishlist_items)
 
     # 3. Read the previously saved data
     previous_wishlist = read_previous_wishlist()
@@ -0,0 +1,90 @@
+import sys
+import json
+import time
+import random
+import tracemalloc
+import firestore_decode
+from firestore_decode import JSON_BACKEND, loads_wishlist_items
+
+# Compares the old wishlist parsing path (response.json() followed by .get() chains)
+# with firestore_decode.loads_wishlist_items. Reports documents per second and the
+# peak bytes allocated while decoding one response. When orjson is installed the
+# stdlib fallback is measured as well.
+# Usage: python bench_wishlist_decode.py [saved_wishlists_response.json]
+# Without a file, a synthetic 300 document response shaped like the real API is used.
+
+DOCUMENT_COUNT = 300
+REPEATS = 50
+# Timings are the best of this many rounds, to smooth out noise from other processes.
+ROUNDS = 5
+
+def build_synthetic_response(count):
+    """Builds a wishlists response with the same shape (and unused fields) as the Firestore API."""
+    rng = random.Random(42)
+    owners = [f"owner{i:02d}{'x' * 20}" for i in range(40)]
+    documents = []
+    for i in range(count):
+        funded = {"doubleValue": rng.random() * 500} if i % 3 else {"integerValue": str(rng.randint(0, 500))}
+        documents.append({
+            "name": f"projects/sent-wc254r/databases/(default)/documents/wishlists/doc{i:05d}",
+            "fields": {
+                "owner": {"stringValue": rng.choice(owners)},
+                "title": {"stringValue": f"wishlist item {i}"},
+                "funded": funded,
+                "goal": {"integerValue": str(rng.randint(50, 1000))},
+                "description": {"stringValue": "lorem ipsum " * 10},
+                "image": {"stringValue": f"https://firebasestorage.googleapis.com/v0/b/img/o/wishlist%2F{i}.png"},
+                "created": {"timestampValue": "2025-09-07T10:37:24.123Z"},
+                "contributors": {"arrayValue": {"values": [{"stringValue": rng.choice(owners)} for _ in range(3)]}},
+                "meta": {"mapValue": {"fields": {"visible": {"booleanValue": True}, "order": {"integerValue": str(i)}}}}
+            },
+            "createTime": "2025-09-07T10:37:24.123456Z",
+            "updateTime": "2025-09-10T19:48:10.654321Z"
+        })
+    return json.dumps({"documents": documents}).encode("utf-8")
+
+def legacy_decode(raw):
+    """The previous path: parse the full tree, then walk it with .get() chains."""
+    api_data = json.loads(raw)
+    items = []
+    for doc in api_data.get("documents", []):
+        fields = doc.get("fields", {})
+        owner_uid = fields.get("owner", {}).get("stringValue")
+        title = fields.get("title", {}).get("stringValue")
+        funded_obj = fields.get("funded", {})
+        funded = funded_obj.get("doubleValue") or funded_obj.get("integerValue")
+        if owner_uid and title and funded is not None:
+            items.append((owner_uid, title, float(funded)))
+    return items
+
+def measure(name, decode, raw, doc_count):
+    decode(raw)  # warm up
+    elapsed = float("inf")
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            decode(raw)
+        elapsed = min(elapsed, time.perf_counter() - started)
+
+    tracemalloc.start()
+    result = decode(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    docs_per_second = doc_count * REPEATS / elapsed
+    print(f"{name:<28} {docs_per_second:>14,.0f} docs/s {peak:>14,} bytes peak   ({len(result)} items)")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as f:
+            raw_response = f.read()
+    else:
+        raw_response = build_synthetic_response(DOCUMENT_COUNT)
+    doc_count = len(json.loads(raw_response).get("documents", []))
+
+    print(f"Decoding {doc_count} documents ({len(raw_response):,} bytes) x {REPEATS} repeats, best of {ROUNDS} rounds")
+    measure("legacy .get() chains", legacy_decode, raw_response, doc_count)
+    measure(f"firestore_decode ({JSON_BACKEND})", loads_wishlist_items, raw_response, doc_count)
+    if firestore_decode.orjson:
+        firestore_decode.orjson = None
+        measure("firestore_decode (json)", loads_wishlist_items, raw_response, doc_count)
@@ -0,0 +1,81 @@
+import json
+from dataclasses import dataclass
+
+# Decodes the Firestore REST "typed Value" format ({"stringValue": ...},
+# {"doubleValue": ...}, {"integerValue": "..."}) straight into small records.
+# orjson (listed in requirements.txt) is the fast path. It has no per-object hook,
+# so it still builds the full response tree before the documents are decoded.
+# Without orjson, the stdlib json module is used with an object_hook that turns
+# each document into a record as soon as it is parsed. The full tree is then
+# never held in memory at once, but the hook runs in Python for every object,
+# so this fallback trades some speed for a much lower peak.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson else "json"
+
+# For each WishlistItem field, in order: the Value kinds accepted (in order of
+# preference) and the Python type the value is converted to. Firestore sends
+# integerValue as a string, which float() accepts directly.
+WISHLIST_SCHEMA = {
+    "owner": (("stringValue",), str),
+    "title": (("stringValue",), str),
+    "funded": (("doubleValue", "integerValue"), float)
+}
+_MISSING = {}
+
+@dataclass(slots=True)
+class WishlistItem:
+    owner: str
+    title: str
+    funded: float
+
+# WISHLIST_SCHEMA flattened into tuples once, so decoding a document is just
+# tuple iteration and dict lookups.
+_FIELD_RULES = tuple((name, kinds, convert) for name, (kinds, convert) in WISHLIST_SCHEMA.items())
+
+def decode_wishlist_fields(fields):
+    """
+    Builds a WishlistItem from a document's fields using WISHLIST_SCHEMA, or returns
+    None if a field is missing or an owner/title is empty. Kinds are checked with `in`,
+    so falsy values such as a 0.0 doubleValue are kept.
+    """
+    values = []
+    for name, kinds, convert in _FIELD_RULES:
+        value = fields.get(name, _MISSING)
+        for kind in kinds:
+            if kind in value:
+                values.append(convert(value[kind]))
+                break
+        else:
+            return None
+    item = WishlistItem(*values)
+    if not item.owner or not item.title:
+        return None
+    return item
+
+def decode_wishlist_documents(api_data):
+    """Decodes an already-parsed wishlists response into a list of WishlistItem."""
+    items = []
+    for doc in api_data.get("documents", []):
+        item = decode_wishlist_fields(doc.get("fields", _MISSING))
+        if item is not None:
+            items.append(item)
+    return items
+
+def _document_hook(obj):
+    # json calls this bottom-up for every object. A document is the object with a
+    # string "name" and a "fields" map (a fields map has Value dicts as its values).
+    if "fields" in obj and type(obj.get("name")) is str:
+        return decode_wishlist_fields(obj["fields"])
+    return obj
+
+def loads_wishlist_items(raw):
+    """Parses a raw wishlists response (bytes or str) directly into a list of WishlistItem."""
+    if orjson:
+        return decode_wishlist_documents(orjson.loads(raw))
+    data = json.loads(raw, object_hook=_document_hook)
+    return [item for item in data.get("documents", []) if type(item) is WishlistItem]
@@ -9,6 +9,9 @@ from zoneinfo import ZoneInfo
 from playwright.sync_api import sync_playwright
 import ast
 import tweepy
+from uid_finder import resolve_uids
+import source_planner
+from firestore_decode import loads_wishlist_items
 
 # This script logs data for specified user profiles from sent.bio.
 # It uses a hybrid approach, fetching data from public APIs and using Playwright
@@ -18,6 +21,11 @@ import tweepy
 load_dotenv()
 
 # --- Configuration ---
+# "uid" may be left out for new profiles; it is looked up (and cached) via uid_finder at startup.
+# "sources" optionally sets a profile's data sources (leaderboard_api, browser,
+# leaderboard_detailed) to "always", "auto" or "never"; anything not listed is "auto".
+# See source_planner.py for how "auto" sources are skipped. The wishlist comes from one
+# shared fetch, so it is always kept unless set to "never" (tweeted profiles always keep it).
 PROFILES_TO_TRACK = [
     {"username": "alquis", "uid": "it54UEAVGkdEcRJLthGuidZHObp2", "has_detailed_leaderboard": False},
     {"username": "gnnx", "uid": "FN70NUv8JFQvEUUre5odEeQny3m2", "has_detailed_leaderboard": False},
@@ -31,6 +39,34 @@ LOG_FOLDER = "data_logs"
 WISHLIST_API_URL = "https://firestore.googleapis.com/v1/projects/sent-wc254r/databases/(default)/documents/wishlists?pageSize=300"
 LEADERBOARD_API_URL = "https://us-central1-sent-wc254r.cloudfunctions.net/fetchLeaderboardPosition"
 
+# --- Configuration for Time Budgets ---
+# The whole run, each profile and each slow source get their own deadline so that
+# one stuck profile can't hold up everyone after it in PROFILES_TO_TRACK.
+RUN_TIME_BUDGET_SECONDS = 600
+PROFILE_TIME_BUDGET_SECONDS = 120
+SOURCE_TIME_BUDGET_SECONDS = {
+    "uid_lookup": 15,
+    "wishlist": 15,
+    "leaderboard_api": 15,
+    "browser": 90
+}
+# Don't start a browser session for a profile with less time than this left in its budget.
+BROWSER_MIN_SECONDS = 20
+# State keys filled in by the browser session, with the value used when nothing is stored yet.
+BROWSER_STATE_DEFAULTS = {
+    "leaderboard_simple": {},
+    "leaderboard_detailed": {},
+    "recent_sends": []
+}
+
+# --- Configuration for the Browser Circuit Breaker ---
+# After this many failed browser sessions in a row a profile skips the browser,
+# and is retried on a later run once a backoff (doubling on each failure) has passed.
+BREAKER_STATE_FILE = "circuit_breaker_state.json"
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_BASE_BACKOFF_SECONDS = 30 * 60
+BREAKER_MAX_BACKOFF_SECONDS = 24 * 60 * 60
+
 # --- Configuration for Automated Tweets ---
 # This dictionary defines which wishlist items trigger tweets for which user.
 TWEET_CONFIG = {
@@ -49,8 +85,38 @@ TWEET_CONFIG = {
 
 captured_console_data = {}
 
+class DeadlineExceeded(Exception):
+    """Raised when a run, profile or source has used up its time budget."""
+
 # --- Helper Functions ---
 
+def source_deadline(parent_deadline, source):
+    """Returns the deadline for a single source, never later than its parent's."""
+    return min(parent_deadline, time.monotonic() + SOURCE_TIME_BUDGET_SECONDS[source])
+
+def seconds_left(deadline, cap=None):
+    """Returns the time left before a deadline (optionally capped), raising once it has passed."""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("time budget exhausted")
+    return remaining if cap is None else min(cap, remaining)
+
+def ms_left(deadline, cap_ms):
+    """Same as seconds_left, but in the integer milliseconds Playwright expects."""
+    return max(1, int(seconds_left(deadline, cap_ms / 1000) * 1000))
+
+def read_response_body(response, deadline):
+    """
+    Reads a streamed response, checking the deadline after every chunk. The requests
+    timeout only limits each read, so this is what bounds the total download time
+    (a stalled read can still overrun by up to one read timeout).
+    """
+    chunks = []
+    for chunk in response.iter_content(chunk_size=65536):
+        seconds_left(deadline)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
 def post_to_twitter(message):
     """Posts a message to Twitter using credentials from environment variables."""
     # Check if credentials are set, if not, just print and simulate success for local testing
@@ -75,48 +141,43 @@ def post_to_twitter(message):
         print(f"ERROR: Failed to post tweet: {e}")
         return False
 
-def get_all_wishlist_data():
-    """Fetches the entire public wishlist collection via direct API call."""
+def get_all_wishlist_data(deadline):
+    """Fetches the entire public wishlist collection and decodes it into a list of WishlistItem."""
     print("Fetching all wishlist data from public API...")
     try:
-        response = requests.get(WISHLIST_API_URL, timeout=15)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        with requests.get(WISHLIST_API_URL, timeout=seconds_left(deadline, 15), stream=True) as response:
+            response.raise_for_status()
+            body = read_response_body(response, deadline)
+        return loads_wishlist_items(body)
+    except (requests.exceptions.RequestException, DeadlineExceeded) as e:
         print(f"Error fetching wishlist API: {e}")
         return None
+    except ValueError as e:
+        print(f"Error decoding wishlist API response: {e}")
+        return None
 
-def get_leaderboard_data(uid):
+def get_leaderboard_data(uid, deadline):
     """Fetches the leaderboard data for a specific user."""
     print(f"Fetching leaderboard data for UID: {uid}...")
     try:
         payload = {"data": {"uid": uid}}
         headers = {"Content-Type": "application/json"}
-        response = requests.post(LEADERBOARD_API_URL, headers=headers, json=payload, timeout=15)
-        response.raise_for_status()
-        data = response.json().get("result", {})
+        with requests.post(LEADERBOARD_API_URL, headers=headers, json=payload,
+                           timeout=seconds_left(deadline, 15), stream=True) as response:
+            response.raise_for_status()
+            body = read_response_body(response, deadline)
+        data = json.loads(body).get("result", {})
         return {
             "position": data.get("place"),
             "amount_away": data.get("amountAway")
         }
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, DeadlineExceeded, ValueError) as e:
         print(f"Error fetching leaderboard API: {e}")
         return None
 
-def parse_and_filter_wishlists(api_data, target_uid):
-    """Parses the full API response and extracts the wishlist for a single user."""
-    user_wishlist = {}
-    documents = api_data.get("documents", [])
-    for doc in documents:
-        fields = doc.get("fields", {})
-        owner_uid = fields.get("owner", {}).get("stringValue")
-        if owner_uid == target_uid:
-            title = fields.get("title", {}).get("stringValue")
-            funded_obj = fields.get("funded", {})
-            funded = funded_obj.get("doubleValue") or funded_obj.get("integerValue")
-            if title and funded is not None:
-                user_wishlist[title] = float(funded)
-    return user_wishlist
+def parse_and_filter_wishlists(wishlist_items, target_uid):
+    """Extracts the wishlist ({title: funded}) for a single user from the decoded items."""
+    return {item.title: item.funded for item in wishlist_items if item.owner == target_uid}
 
 def handle_console_message(msg):
     global captured_console_data
@@ -175,40 +236,51 @@ def handle_console_message(msg):
     except ValueError:
         pass
 
-def get_data_from_console_via_playwright(username, should_click_leaderboard):
+def get_data_from_console_via_playwright(username, should_click_leaderboard, deadline):
+    """
+    Captures console data from the profile page. Every wait is clamped to the
+    deadline. Returns None if the session failed, and raises DeadlineExceeded
+    if it was cut short by the deadline.
+    """
     global captured_console_data
     captured_console_data = {}
     print(f"Launching robot browser for {username} to get console data...")
     try:
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
+            browser = p.chromium.launch(headless=True, timeout=ms_left(deadline, 30000))
             page = browser.new_page()
             page.set_viewport_size({"width": 1280, "height": 720})
             page.on("console", handle_console_message)
 
             print(f"  Navigating to https://sent.bio/{username}...")
-            page.goto(f"https://sent.bio/{username}", wait_until="load", timeout=45000)
+            page.goto(f"https://sent.bio/{username}", wait_until="load", timeout=ms_left(deadline, 45000))
             print("  Waiting for app container...")
-            page.locator("flutter-view").wait_for(state='attached', timeout=30000)
+            page.locator("flutter-view").wait_for(state='attached', timeout=ms_left(deadline, 30000))
             print("  Waiting 5 seconds for dynamic content to load...")
-            page.wait_for_timeout(5000)
+            page.wait_for_timeout(ms_left(deadline, 5000))
 
             if should_click_leaderboard:
+                click_timeout = ms_left(deadline, 10000)
                 try:
                     print(f"  Profile flagged for click. Clicking coordinates: X={CLICK_COORDS['x']}, Y={CLICK_COORDS['y']}")
-                    with page.expect_console_message(lambda msg: "fetchLeaderboard response:" in msg.text, timeout=10000):
+                    with page.expect_console_message(lambda msg: "fetchLeaderboard response:" in msg.text, timeout=click_timeout):
                         page.mouse.click(CLICK_COORDS['x'], CLICK_COORDS['y'])
                     print("  Successfully clicked and detected leaderboard response.")
                 except Exception as click_error:
                     print(f"  Warning: Did not see the rich leaderboard response after clicking: {click_error}")
 
             print("  Waiting 2 seconds for streams to finalize...")
-            page.wait_for_timeout(2000)
+            page.wait_for_timeout(ms_left(deadline, 2000))
             browser.close()
             return captured_console_data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
+        # A Playwright timeout that fired at the clamped deadline is a deadline, not a broken page.
+        if deadline - time.monotonic() < 1:
+            raise DeadlineExceeded(f"browser session for {username} ran out of time: {e}") from e
         print(f"An error occurred during browser automation for {username}: {e}")
-        return {}
+        return None
 
 def read_state(username):
     state_file = STATE_FILE_TEMPLATE.format(username=username)
@@ -222,39 +294,200 @@ def write_state(username, data):
     with open(state_file, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=2)
 
+def resolve_profile_uids(profiles, deadline):
+    """Fills in missing UIDs from the uid_finder cache/lookup and drops profiles that couldn't be resolved."""
+    missing = [p["username"] for p in profiles if not p.get("uid")]
+    if not missing: return profiles
+    print(f"Resolving UIDs for new profiles: {', '.join(missing)}")
+    found = resolve_uids(missing, deadline=deadline)
+    resolved = []
+    for profile in profiles:
+        if not profile.get("uid"):
+            uid = found.get(profile["username"])
+            if uid in (None, "NOT_FOUND", "FETCH_ERROR"):
+                print(f"Warning: Could not resolve a UID for {profile['username']} ({uid}). Skipping this profile.")
+                continue
+            profile = {**profile, "uid": uid}
+        resolved.append(profile)
+    return resolved
+
+def profile_source_modes(profile):
+    """Returns the declared source modes for a profile, honouring has_detailed_leaderboard."""
+    modes = dict(profile.get("sources", {}))
+    if not profile.get("has_detailed_leaderboard", False):
+        modes.setdefault("leaderboard_detailed", "never")
+    return modes
+
+def wants_wishlist(profile):
+    """Whether a profile's wishlist is collected. Profiles whose wishlist is tweeted or logged always need it."""
+    username = profile["username"]
+    if username in TWEET_CONFIG or username == "alquis":
+        return True
+    return profile.get("sources", {}).get("wishlist") != "never"
+
+def baseline_sources(profile):
+    """Sources that ran for every profile before the planner existed, used to report savings."""
+    sources = {"leaderboard_api", "browser"}
+    if profile.get("has_detailed_leaderboard", False):
+        sources.add("leaderboard_detailed")
+    return sources
+
+def read_breaker_state():
+    if not os.path.exists(BREAKER_STATE_FILE): return {}
+    with open(BREAKER_STATE_FILE, 'r', encoding='utf-8') as f:
+        try: return json.load(f)
+        except json.JSONDecodeError: return {}
+
+def write_breaker_state(data):
+    with open(BREAKER_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+def breaker_allows_attempt(breaker_state, username, now):
+    """A profile's browser session may run unless its breaker is open and still backing off."""
+    entry = breaker_state.get(username, {})
+    if entry.get("failures", 0) < BREAKER_FAILURE_THRESHOLD:
+        return True
+    return now >= entry.get("retry_after", 0)
+
+def record_breaker_result(breaker_state, username, succeeded, now):
+    """Resets a profile's breaker on success, or counts the failure and schedules the next retry."""
+    if succeeded:
+        breaker_state.pop(username, None)
+        return
+    entry = breaker_state.setdefault(username, {"failures": 0})
+    entry["failures"] += 1
+    if entry["failures"] >= BREAKER_FAILURE_THRESHOLD:
+        exponent = entry["failures"] - BREAKER_FAILURE_THRESHOLD
+        backoff = min(BREAKER_BASE_BACKOFF_SECONDS * 2 ** exponent, BREAKER_MAX_BACKOFF_SECONDS)
+        entry["retry_after"] = now + backoff
+        print(f"  Circuit breaker open for {username} after {entry['failures']} failures. Next browser attempt in {backoff // 60} minutes.")
+
 # --- Main Execution ---
 if __name__ == "__main__":
     print("Starting Ultimate Hybrid Data Logger v5.0 with Tweeting...")
 
-    full_wishlist_data = get_all_wishlist_data()
-    if not full_wishlist_data:
-        print("Could not fetch wishlist data. Aborting.")
-        exit()
-        
+    run_started = time.monotonic()
+    run_deadline = run_started + RUN_TIME_BUDGET_SECONDS
+    breaker_state = read_breaker_state()
+    original_breaker_state = json.loads(json.dumps(breaker_state))
+    partial_profiles = []
+
+    profiles_to_process = resolve_profile_uids(PROFILES_TO_TRACK, source_deadline(run_deadline, "uid_lookup"))
+
+    planner_state = source_planner.read_planner_state()
+    plans = {}
+    skipped_count = 0
+    estimated_savings = 0.0
+    print("\n--- Source Plan ---")
+    original_planner_state = json.loads(json.dumps(planner_state))
+    for profile in profiles_to_process:
+        username = profile["username"]
+        plans[username] = source_planner.plan_profile(
+            username, profile_source_modes(profile), planner_state, time.time()
+        )
+        skipped, saved = source_planner.describe_plan(username, plans[username], baseline_sources(profile))
+        skipped_count += skipped
+        estimated_savings += saved
+    print(f"Planner skips {skipped_count} source run(s), saving an estimated {estimated_savings:.1f}s.")
+
+    wishlist_items = None
+    if any(wants_wishlist(profile) for profile in profiles_to_process):
+        wishlist_items = get_all_wishlist_data(source_deadline(run_deadline, "wishlist"))
+        if wishlist_items is None:
+            print("Could not fetch wishlist data. Continuing with the last stored wishlists.")
+    else:
+        print("No profile needs wishlist data this run, skipping the wishlist API.")
+
     now_est_str = datetime.now(ZoneInfo("America/New_York")).strftime("%H:%M")
     
     has_alquis_wishlist_changed = False
 
-    for profile in PROFILES_TO_TRACK:
+    for profile in profiles_to_process:
         username = profile["username"]
         uid = profile["uid"]
-        should_click = profile.get("has_detailed_leaderboard", False)
+        plan = plans[username]
+        should_click = plan["leaderboard_detailed"][0]
 
         print(f"\n--- Processing Profile: {username} ---")
+        profile_deadline = min(run_deadline, time.monotonic() + PROFILE_TIME_BUDGET_SECONDS)
 
         previous_state = read_state(username)
-        wishlist = parse_and_filter_wishlists(full_wishlist_data, uid)
-        api_leaderboard_data = get_leaderboard_data(uid)
-        console_data = get_data_from_console_via_playwright(username, should_click)
+
+        wishlist = None
+        if wants_wishlist(profile) and wishlist_items is not None:
+            wishlist = parse_and_filter_wishlists(wishlist_items, uid)
+
+        api_leaderboard_data = None
+        if plan["leaderboard_api"][0]:
+            api_leaderboard_data = get_leaderboard_data(uid, source_deadline(profile_deadline, "leaderboard_api"))
+            # None means the request failed; that is tracked apart from an empty response.
+            if plan["leaderboard_api"][2]:
+                if api_leaderboard_data is None:
+                    source_planner.record_failure(planner_state, username, "leaderboard_api", time.time())
+                else:
+                    had_data = any(v is not None for v in api_leaderboard_data.values())
+                    source_planner.record_result(planner_state, username, "leaderboard_api", had_data, time.time())
+
+        console_data = None
+        if plan["browser"][0]:
+            if not breaker_allows_attempt(breaker_state, username, time.time()):
+                print(f"Circuit breaker open for {username}, skipping browser session this run.")
+            elif profile_deadline - time.monotonic() < BROWSER_MIN_SECONDS:
+                print(f"Not enough time left in the budget for {username}, skipping browser session.")
+            else:
+                browser_deadline = source_deadline(profile_deadline, "browser")
+                try:
+                    console_data = get_data_from_console_via_playwright(username, should_click, browser_deadline)
+                    record_breaker_result(breaker_state, username, console_data is not None, time.time())
+                except DeadlineExceeded as e:
+                    print(f"Browser session for {username} stopped at its deadline: {e}")
+                    # Only the browser's own budget running out counts against the profile;
+                    # a run or profile budget used up by earlier work does not.
+                    if browser_deadline < profile_deadline:
+                        record_breaker_result(breaker_state, username, False, time.time())
+                # Failed sessions are the circuit breaker's business, so only successful ones teach the planner.
+                if console_data is not None:
+                    if plan["browser"][2]:
+                        had_data = bool(console_data.get("simple_leaderboard") or console_data.get("recent_sends")
+                                        or console_data.get("leaderboard_detailed"))
+                        source_planner.record_result(planner_state, username, "browser", had_data, time.time())
+                    if should_click and plan["leaderboard_detailed"][2]:
+                        had_detailed = bool(console_data.get("leaderboard_detailed"))
+                        source_planner.record_result(planner_state, username, "leaderboard_detailed", had_detailed, time.time())
 
         current_state = {
-            "wishlist": wishlist,
-            "leaderboard_simple_api": api_leaderboard_data,
-            "leaderboard_simple": console_data.get("simple_leaderboard", {}),
-            "leaderboard_detailed": console_data.get("leaderboard_detailed", {}),
-            "recent_sends": console_data.get("recent_sends", [])
+            "wishlist": wishlist if wishlist is not None else previous_state.get("wishlist", {}),
+            "leaderboard_simple_api": api_leaderboard_data
         }
 
+        # Sources the planner skipped keep their last known values. Sources that were
+        # planned but failed or ran out of time keep them too, and are listed so the
+        # state is marked as partial instead of being blanked out. A source that the
+        # planner or circuit breaker has switched off (including on this run) is an
+        # expected gap, not a partial result.
+        partial_sources = []
+        if wishlist is None and wants_wishlist(profile):
+            partial_sources.append("wishlist")
+        if api_leaderboard_data is None:
+            current_state["leaderboard_simple_api"] = previous_state.get("leaderboard_simple_api")
+            if plan["leaderboard_api"][0] and not source_planner.is_switched_off(planner_state, username, "leaderboard_api"):
+                partial_sources.append("leaderboard_simple_api")
+        if console_data is None:
+            for key, default in BROWSER_STATE_DEFAULTS.items():
+                current_state[key] = previous_state.get(key, default)
+            if plan["browser"][0] and breaker_allows_attempt(breaker_state, username, time.time()):
+                partial_sources.extend(BROWSER_STATE_DEFAULTS)
+        else:
+            current_state["leaderboard_simple"] = console_data.get("simple_leaderboard", {})
+            if should_click:
+                current_state["leaderboard_detailed"] = console_data.get("leaderboard_detailed", {})
+            else:
+                current_state["leaderboard_detailed"] = previous_state.get("leaderboard_detailed", {})
+            current_state["recent_sends"] = console_data.get("recent_sends", [])
+        if partial_sources:
+            current_state["partial_sources"] = partial_sources
+            partial_profiles.append(username)
+
         print("--- Parsed Data ---")
         print(json.dumps(current_state, indent=2))
         
@@ -305,6 +538,16 @@ if __name__ == "__main__":
         else:
             print(f"\nNo changes detected for {username}.")
 
+    if breaker_state != original_breaker_state:
+        write_breaker_state(breaker_state)
+    if planner_state != original_planner_state:
+        source_planner.write_planner_state(planner_state)
+
+    print(f"\nRun finished in {time.monotonic() - run_started:.1f}s (budget {RUN_TIME_BUDGET_SECONDS}s).")
+    print(f"Source planner skipped {skipped_count} source run(s), an estimated {estimated_savings:.1f}s saved.")
+    if partial_profiles:
+        print(f"Partial results for: {', '.join(partial_profiles)}")
+
     if has_alquis_wishlist_changed:
         print("\n--- Alquis' specified wishlist items changed! Saving a new combined data log. ---")
         if not os.path.exists(LOG_FOLDER): os.makedirs(LOG_FOLDER)
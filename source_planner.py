@@ -0,0 +1,120 @@
+import os
+import json
+
+# This module decides which data sources each profile actually needs on a run.
+# Sources are declared per profile in logger.py as "always", "auto" or "never".
+# "auto" sources are skipped once they have come back empty, or failed outright,
+# several runs in a row, and are re-probed once a while has passed in case the
+# profile starts using them (or the endpoint starts working again).
+# Only these decisions are persisted (no timings or per-run counters), so the
+# state file only changes when a decision does.
+
+PLANNER_STATE_FILE = "source_planner_state.json"
+SOURCE_MODES = ("always", "auto", "never")
+# Sources in the order they are collected; a source listed in SOURCE_DEPENDENCIES
+# only runs if the source it depends on runs too.
+SOURCES = ("leaderboard_api", "browser", "leaderboard_detailed")
+SOURCE_DEPENDENCIES = {"leaderboard_detailed": "browser"}
+EMPTY_STREAK_THRESHOLD = 5
+FAILURE_STREAK_THRESHOLD = 5
+REPROBE_AFTER_SECONDS = 12 * 60 * 60
+# Rough cost of each source in seconds, used to report what a plan saves.
+ESTIMATED_COST_SECONDS = {
+    "leaderboard_api": 1.0,
+    "browser": 15.0,
+    "leaderboard_detailed": 5.0
+}
+
+def read_planner_state():
+    if not os.path.exists(PLANNER_STATE_FILE): return {}
+    with open(PLANNER_STATE_FILE, 'r', encoding='utf-8') as f:
+        try: return json.load(f)
+        except json.JSONDecodeError: return {}
+
+def write_planner_state(data):
+    with open(PLANNER_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+def plan_profile(username, declared_modes, history, now):
+    """
+    Builds the plan for one profile. Returns {source: (should_run, reason, learns)},
+    where `learns` is True for "auto" sources whose results should update the history.
+    """
+    plan = {}
+    for source in SOURCES:
+        mode = declared_modes.get(source, "auto")
+        if mode not in SOURCE_MODES:
+            raise ValueError(f"Unknown mode '{mode}' for source '{source}' of {username}")
+        entry = history.get(username, {}).get(source, {})
+        parent = SOURCE_DEPENDENCIES.get(source)
+
+        if parent and not plan[parent][0]:
+            plan[source] = (False, f"needs {parent}", False)
+        elif mode == "never":
+            plan[source] = (False, "disabled in config", False)
+        elif mode == "always":
+            plan[source] = (True, "always in config", False)
+        elif (entry.get("empty_streak", 0) < EMPTY_STREAK_THRESHOLD
+              and entry.get("failure_streak", 0) < FAILURE_STREAK_THRESHOLD):
+            plan[source] = (True, "auto", True)
+        elif now >= entry.get("probe_after", 0):
+            plan[source] = (True, "re-probing", True)
+        elif entry.get("failure_streak", 0) >= FAILURE_STREAK_THRESHOLD:
+            plan[source] = (False, f"failed for the last {entry['failure_streak']}+ runs", True)
+        else:
+            plan[source] = (False, f"empty for the last {entry['empty_streak']}+ runs", True)
+    return plan
+
+def record_result(history, username, source, had_data, now):
+    """
+    Updates a source's history after it ran and returned a response. The streak
+    stops counting at the threshold, and a re-probe time is set whenever the
+    source is switched off.
+    """
+    if had_data:
+        history.get(username, {}).pop(source, None)
+        if username in history and not history[username]:
+            del history[username]
+        return
+    entry = history.setdefault(username, {}).setdefault(source, {})
+    entry.pop("failure_streak", None)
+    entry["empty_streak"] = min(entry.get("empty_streak", 0) + 1, EMPTY_STREAK_THRESHOLD)
+    if entry["empty_streak"] >= EMPTY_STREAK_THRESHOLD:
+        entry["probe_after"] = int(now + REPROBE_AFTER_SECONDS)
+
+def record_failure(history, username, source, now):
+    """
+    Updates a source's history after its request failed. Failures are counted
+    separately from empty results, but switch the source off the same way.
+    """
+    entry = history.setdefault(username, {}).setdefault(source, {})
+    entry["failure_streak"] = min(entry.get("failure_streak", 0) + 1, FAILURE_STREAK_THRESHOLD)
+    if entry["failure_streak"] >= FAILURE_STREAK_THRESHOLD:
+        entry["probe_after"] = int(now + REPROBE_AFTER_SECONDS)
+
+def is_switched_off(history, username, source):
+    """Whether a source's history has switched it off (it only runs again as a re-probe)."""
+    entry = history.get(username, {}).get(source, {})
+    return (entry.get("empty_streak", 0) >= EMPTY_STREAK_THRESHOLD
+            or entry.get("failure_streak", 0) >= FAILURE_STREAK_THRESHOLD)
+
+def describe_plan(username, plan, baseline_sources):
+    """
+    Prints a profile's plan and returns (sources skipped, estimated seconds saved).
+    Only skipped sources in `baseline_sources` (what would have run without the
+    planner) are counted.
+    """
+    print(f"  {username}:")
+    skipped = 0
+    saved = 0.0
+    for source, (should_run, reason, _) in plan.items():
+        if should_run:
+            print(f"    run   {source:<22} ({reason})")
+        elif source in baseline_sources:
+            cost = ESTIMATED_COST_SECONDS[source]
+            skipped += 1
+            saved += cost
+            print(f"    skip  {source:<22} ({reason}, ~{cost:.1f}s saved)")
+        else:
+            print(f"    skip  {source:<22} ({reason})")
+    return skipped, saved
@@ -1,6 +1,12 @@
-import requests
-from bs4 import BeautifulSoup
+import os
 import re
+import sys
+import json
+import time
+import codecs
+import requests
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Add the usernames you want to find UIDs for here ---
 USERNAMES_TO_FIND = [
@@ -9,41 +15,145 @@ USERNAMES_TO_FIND = [
     "digitalvicc"
 ]
 
-def find_uids():
-    print("--- Starting UID Finder ---")
-    results = {}
-    for username in USERNAMES_TO_FIND:
-        profile_url = f"https://sent.bio/{username}"
-        print(f"Searching on {profile_url}...")
-        try:
-            response = requests.get(profile_url, timeout=10)
+# --- Cache Configuration ---
+# UIDs never change for a username, so lookups are cached on disk and only
+# repeated once an entry is older than the TTL (or explicitly invalidated).
+UID_CACHE_FILE = "uid_cache.json"
+UID_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+MAX_CONCURRENT_LOOKUPS = 8
+STREAM_CHUNK_SIZE = 4096
+
+UID_PATTERN = re.compile(r"public_users(?:/|%2F)([a-zA-Z0-9]+)(?:/|%2F)")
+
+class OgImageUidParser(HTMLParser):
+    """
+    Incremental parser that looks for the og:image meta tag holding the UID.
+    Sets `done` once the UID is found or the <head> is over, so the caller can
+    stop downloading the rest of the page.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.uid = None
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done: return
+        if tag == "body":
+            self.done = True
+            return
+        if tag != "meta": return
+        attrs = dict(attrs)
+        content = attrs.get("content") or ""
+        if attrs.get("property") == "og:image" and "public_users" in content:
+            match = UID_PATTERN.search(content)
+            if match:
+                self.uid = match.group(1)
+                self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.done = True
+
+def find_uid(username, deadline=None):
+    """
+    Streams https://sent.bio/{username} and returns its UID, reading only as far as the og:image tag.
+    Returns "NOT_FOUND" if the page has no UID and "FETCH_ERROR" if the request failed
+    or didn't finish before `deadline` (a time.monotonic() value).
+    """
+    profile_url = f"https://sent.bio/{username}"
+    print(f"Searching on {profile_url}...")
+    timeout = 10 if deadline is None else min(10, deadline - time.monotonic())
+    if timeout <= 0:
+        print(f"  ERROR: No time left to look up {username}.")
+        return "FETCH_ERROR"
+    parser = OgImageUidParser()
+    try:
+        with requests.get(profile_url, timeout=timeout, stream=True) as response:
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            meta_tags = soup.find_all('meta', property='og:image')
-            
-            found_uid = None
-            for tag in meta_tags:
-                if tag.has_attr('content') and "public_users" in tag['content']:
-                    match = re.search(r"public_users(?:/|%2F)([a-zA-Z0-9]+)(?:/|%2F)", tag['content'])
-                    if match:
-                        found_uid = match.group(1)
-                        break
-            
-            if found_uid:
-                print(f"  SUCCESS: Found UID for {username}: {found_uid}")
-                results[username] = found_uid
-            else:
-                print(f"  FAILURE: Could not find a UID for {username}.")
-                results[username] = "NOT_FOUND"
-
-        except requests.exceptions.RequestException as e:
-            print(f"  ERROR: Could not fetch page for {username}: {e}")
-            results[username] = "FETCH_ERROR"
-            
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                parser.feed(decoder.decode(chunk))
+                if parser.done: break
+                if deadline is not None and time.monotonic() >= deadline:
+                    print(f"  ERROR: Ran out of time reading the page for {username}.")
+                    return "FETCH_ERROR"
+    except requests.exceptions.RequestException as e:
+        print(f"  ERROR: Could not fetch page for {username}: {e}")
+        return "FETCH_ERROR"
+    except LookupError as e:
+        print(f"  ERROR: Unknown page encoding for {username}: {e}")
+        return "FETCH_ERROR"
+
+    if parser.uid:
+        print(f"  SUCCESS: Found UID for {username}: {parser.uid}")
+        return parser.uid
+    print(f"  FAILURE: Could not find a UID for {username}.")
+    return "NOT_FOUND"
+
+def read_uid_cache():
+    if not os.path.exists(UID_CACHE_FILE): return {}
+    with open(UID_CACHE_FILE, 'r', encoding='utf-8') as f:
+        try: return json.load(f)
+        except json.JSONDecodeError: return {}
+
+def write_uid_cache(cache):
+    with open(UID_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+def invalidate_uids(usernames=None):
+    """Drops the given usernames from the cache, or clears it entirely if none are given."""
+    cache = {} if usernames is None else read_uid_cache()
+    for username in usernames or []:
+        cache.pop(username, None)
+    write_uid_cache(cache)
+
+def resolve_uids(usernames, refresh=False, deadline=None):
+    """
+    Returns {username: uid} for the given usernames. Fresh cache entries are used
+    as-is; missing or expired ones are looked up concurrently (each bounded by the
+    optional `deadline`) and cached. Lookups that fail are returned as
+    "NOT_FOUND"/"FETCH_ERROR" and are not cached.
+    """
+    cache = read_uid_cache()
+    now = time.time()
+    results = {}
+    to_lookup = []
+    for username in dict.fromkeys(usernames):
+        entry = cache.get(username)
+        if not refresh and entry and now - entry.get("resolved_at", 0) < UID_CACHE_TTL_SECONDS:
+            results[username] = entry["uid"]
+        else:
+            to_lookup.append(username)
+
+    if to_lookup:
+        workers = min(MAX_CONCURRENT_LOOKUPS, len(to_lookup))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            found = dict(zip(to_lookup, executor.map(lambda username: find_uid(username, deadline), to_lookup)))
+        for username, uid in found.items():
+            results[username] = uid
+            if uid not in ("NOT_FOUND", "FETCH_ERROR"):
+                cache[username] = {"uid": uid, "resolved_at": now}
+        write_uid_cache(cache)
+
+    return results
+
+def find_uids(refresh=False):
+    print("--- Starting UID Finder ---")
+    results = resolve_uids(USERNAMES_TO_FIND, refresh=refresh)
+
     print("\n--- Results ---")
     print("Copy the following lines into your logger.py PROFILES_TO_TRACK list:")
     for username, uid in results.items():
         print(f'    {{\n        "username": "{username}",\n        "uid": "{uid}",\n        "wishlist_tweet": "{username}\'s \'{{title}}\' goal received ${{amount:.2f}}! at {{time}} EST",\n        "tip_tweet": "{username} also received a random tip! at {{time}} EST"\n    }},')
 
 if __name__ == "__main__":
-    find_uids()
\ No newline at end of file
+    args = sys.argv[1:]
+    if args[:1] == ["--invalidate"]:
+        # --invalidate [username ...] drops those cached UIDs (or the whole cache when no
+        # usernames are given), so they are looked up again on the next run.
+        invalidate_uids(args[1:] or None)
+        print(f"Invalidated cached UIDs for: {', '.join(args[1:]) or 'all usernames'}")
+    else:
+        # Pass --refresh to ignore cached UIDs and look every username up again.
+        find_uids(refresh="--refresh" in args)